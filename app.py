@@ -1,10 +1,12 @@
 import streamlit as st
-import openai
 import json
 import hashlib
 import re
 import sqlite3
-import bcrypt
+import queue
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
 import os
 from dotenv import load_dotenv
@@ -20,130 +22,223 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Initialize OpenAI
-openai.api_key = os.getenv('OPENAI_API_KEY')
+# Heavy clients are imported and configured once per server process, on
+# first use, instead of on every Streamlit rerun
+@st.cache_resource
+def _openai_client():
+    """Create the shared OpenAI client"""
+    from openai import OpenAI
+    # One client per process keeps its HTTP connection pool warm, so
+    # requests after the first skip the TCP and TLS handshake
+    return OpenAI(api_key=os.getenv('OPENAI_API_KEY'), timeout=30)
+
+@st.cache_resource
+def _bcrypt():
+    """Import the bcrypt module"""
+    import bcrypt
+    return bcrypt
+
+# Database connection pool
+DB_PATH = 'users.db'
+DB_POOL_SIZE = 4
+
+@st.cache_resource
+def _connection_pool():
+    """Create a process-wide pool of reusable SQLite connections"""
+    pool = queue.Queue(maxsize=DB_POOL_SIZE)
+    for _ in range(DB_POOL_SIZE):
+        # Streamlit serves sessions from multiple threads, so connections
+        # must be shareable; the pool guarantees one borrower at a time
+        conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.execute("PRAGMA cache_size=-32000")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA mmap_size=268435456")
+        pool.put(conn)
+    return pool
+
+@contextmanager
+def get_conn():
+    """Borrow a pooled connection and return it when done"""
+    pool = _connection_pool()
+    conn = pool.get()
+    try:
+        yield conn
+    finally:
+        # Never hand back a connection holding an open transaction
+        if conn.in_transaction:
+            conn.rollback()
+        pool.put(conn)
 
 # Database initialization
 def init_database():
     """Initialize SQLite database with secure practices"""
-    conn = sqlite3.connect('users.db')
-    cursor = conn.cursor()
-    
-    # Create users table with proper constraints
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            email TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL,
-            age INTEGER NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            last_login TIMESTAMP
-        )
-    ''')
-    
-    # Create user progress table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS user_progress (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            topic TEXT NOT NULL,
-            quiz_score INTEGER,
-            completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (user_id) REFERENCES users (id)
+    with get_conn() as conn:
+        cursor = conn.cursor()
+        
+        # Create users table with proper constraints
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                email TEXT UNIQUE NOT NULL,
+                password_hash TEXT NOT NULL,
+                age INTEGER NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_login TIMESTAMP
+            )
+        ''')
+        
+        # Create user progress table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS user_progress (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                topic TEXT NOT NULL,
+                quiz_score INTEGER,
+                completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users (id)
+            )
+        ''')
+        
+        # Covering index so recent-progress lookups are an ordered index scan
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_progress_user_time
+            ON user_progress (user_id, completed_at DESC, topic, quiz_score)
+        ''')
+        
+        # Bring emails stored before normalization in line with lookups;
+        # rows that would collide with an existing account are left as-is
+        # and authenticate_user still finds them by their exact address
+        cursor.execute(
+            "UPDATE OR IGNORE users SET email = lower(trim(email)) WHERE email != lower(trim(email))"
         )
-    ''')
-    
-    conn.commit()
-    conn.close()
+        
+        conn.commit()
+
+@st.cache_resource
+def _init_db_once():
+    """Run database initialization once per server process"""
+    init_database()
+    return True
+
+# bcrypt work factor; each step doubles hashing cost. Existing hashes keep
+# verifying because the cost is stored inside each hash.
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '10'))
 
 def hash_password_secure(password):
     """Secure password hashing using bcrypt"""
-    salt = bcrypt.gensalt()
+    bcrypt = _bcrypt()
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
     return bcrypt.hashpw(password.encode('utf-8'), salt)
 
 def verify_password(password, hashed):
     """Verify password against hash"""
-    return bcrypt.checkpw(password.encode('utf-8'), hashed)
+    return _bcrypt().checkpw(password.encode('utf-8'), hashed)
+
+def needs_rehash(hashed):
+    """Check whether a hash was made with a different work factor"""
+    # bcrypt hashes look like $2b$12$..., with the cost at [4:6]
+    return int(hashed[4:6]) != BCRYPT_ROUNDS
+
+@st.cache_resource
+def _dummy_password_hash():
+    """Hash compared against on unknown emails so misses cost the same as hits"""
+    return hash_password_secure("dummy-password")
+
+def normalize_email(email):
+    """Canonicalize an email so case and Unicode form don't create duplicates"""
+    return unicodedata.normalize("NFC", email.strip().lower())
 
 def create_user(email, password, age):
     """Create new user with parameterized queries"""
-    conn = sqlite3.connect('users.db')
-    cursor = conn.cursor()
-    
-    try:
-        # Use parameterized query to prevent SQL injection
-        hashed_password = hash_password_secure(password)
-        cursor.execute(
-            "INSERT INTO users (email, password_hash, age) VALUES (?, ?, ?)",
-            (email, hashed_password, age)
-        )
-        conn.commit()
-        user_id = cursor.lastrowid
-        return user_id
-    except sqlite3.IntegrityError:
-        return None  # User already exists
-    finally:
-        conn.close()
+    email = normalize_email(email)
+    # Hash before borrowing a connection so bcrypt doesn't hold it
+    hashed_password = hash_password_secure(password)
+    
+    with get_conn() as conn:
+        cursor = conn.cursor()
+        try:
+            # Use parameterized query to prevent SQL injection
+            cursor.execute(
+                "INSERT INTO users (email, password_hash, age) VALUES (?, ?, ?)",
+                (email, hashed_password, age)
+            )
+            conn.commit()
+            user_id = cursor.lastrowid
+            return user_id
+        except sqlite3.IntegrityError:
+            return None  # User already exists
 
 def authenticate_user(email, password):
     """Authenticate user with secure practices"""
-    conn = sqlite3.connect('users.db')
-    cursor = conn.cursor()
-    
-    try:
-        # Use parameterized query
-        cursor.execute(
-            "SELECT id, password_hash, age FROM users WHERE email = ?",
-            (email,)
-        )
-        result = cursor.fetchone()
+    normalized = normalize_email(email)
+    with get_conn() as conn:
+        # Use parameterized query. An exact match wins over the normalized
+        # address, so accounts init_database couldn't normalize (they differ
+        # from another account only by case) stay reachable as registered
+        result = conn.execute(
+            "SELECT id, email, password_hash, age FROM users WHERE email IN (?, ?) "
+            "ORDER BY email = ? DESC LIMIT 1",
+            (normalized, email, email)
+        ).fetchone()
+    
+    # Verify outside the pool so slow bcrypt work doesn't hold a connection.
+    # Exactly one bcrypt compare runs per attempt, so response time doesn't
+    # reveal whether the email is registered or has a case-variant duplicate
+    password_hash = result['password_hash'] if result else _dummy_password_hash()
+    password_ok = verify_password(password, password_hash)
+    
+    if result and password_ok:
+        # Rehash at the current work factor so stored costs converge and
+        # the dummy hash on misses costs the same as a real account
+        new_hash = hash_password_secure(password) if needs_rehash(password_hash) else None
         
-        if result and verify_password(password, result[1]):
-            # Update last login
-            cursor.execute(
-                "UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = ?",
-                (result[0],)
-            )
+        # Update last login only once the password has been verified
+        with get_conn() as conn:
+            if new_hash:
+                conn.execute(
+                    "UPDATE users SET last_login = CURRENT_TIMESTAMP, password_hash = ? WHERE id = ?",
+                    (new_hash, result['id'])
+                )
+            else:
+                conn.execute(
+                    "UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = ?",
+                    (result['id'],)
+                )
             conn.commit()
-            return {
-                'id': result[0],
-                'email': email,
-                'age': result[2]
-            }
-        return None
-    finally:
-        conn.close()
+        return {
+            'id': result['id'],
+            'email': result['email'],
+            'age': result['age']
+        }
+    return None
 
 def save_user_progress(user_id, topic, score):
     """Save user quiz progress"""
-    conn = sqlite3.connect('users.db')
-    cursor = conn.cursor()
-    
-    try:
+    with get_conn() as conn:
+        cursor = conn.cursor()
         cursor.execute(
             "INSERT INTO user_progress (user_id, topic, quiz_score) VALUES (?, ?, ?)",
             (user_id, topic, score)
         )
         conn.commit()
-    finally:
-        conn.close()
 
-def get_user_progress(user_id):
-    """Get user's learning progress"""
-    conn = sqlite3.connect('users.db')
-    cursor = conn.cursor()
-    
-    try:
+def get_user_progress(user_id, limit=5):
+    """Get user's most recent learning progress"""
+    with get_conn() as conn:
+        cursor = conn.cursor()
         cursor.execute(
-            "SELECT topic, quiz_score, completed_at FROM user_progress WHERE user_id = ? ORDER BY completed_at DESC",
-            (user_id,)
+            "SELECT topic, quiz_score, completed_at FROM user_progress WHERE user_id = ? ORDER BY completed_at DESC LIMIT ?",
+            (user_id, limit)
         )
-        return cursor.fetchall()
-    finally:
-        conn.close()
+        cursor.arraysize = limit
+        return cursor.fetchmany()
 
 # Custom CSS for styling (same as before)
-st.markdown("""
+CUSTOM_CSS = """
 <style>
     .main-header {
         background: linear-gradient(90deg, #667eea 0%, #764ba2 100%);
@@ -222,7 +317,16 @@ st.markdown("""
         margin: 1rem 0;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+@st.cache_resource
+def _minified_css():
+    """Collapse whitespace in the stylesheet once per server process"""
+    return re.sub(r'\s+', ' ', CUSTOM_CSS).strip()
+
+# Streamlit drops elements that a rerun doesn't emit, so the styles have to
+# be sent every run; sending them minified keeps that payload small
+st.markdown(_minified_css(), unsafe_allow_html=True)
 
 # Initialize session state
 if 'logged_in' not in st.session_state:
@@ -233,6 +337,8 @@ if 'current_lesson' not in st.session_state:
     st.session_state.current_lesson = None
 if 'quiz_questions' not in st.session_state:
     st.session_state.quiz_questions = []
+if 'quiz_future' not in st.session_state:
+    st.session_state.quiz_future = None
 if 'quiz_answers' not in st.session_state:
     st.session_state.quiz_answers = {}
 if 'quiz_submitted' not in st.session_state:
@@ -240,10 +346,11 @@ if 'quiz_submitted' not in st.session_state:
 if 'lesson_topic' not in st.session_state:
     st.session_state.lesson_topic = ""
 
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
 def validate_email(email):
     """Validate email format"""
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return re.match(pattern, email) is not None
+    return EMAIL_PATTERN.match(normalize_email(email)) is not None
 
 def login_page():
     """Display login page with registration"""
@@ -317,7 +424,7 @@ def display_user_progress():
             st.markdown('<div class="progress-container">', unsafe_allow_html=True)
             st.markdown("### 📊 Your Learning Progress")
             
-            for topic, score, completed_at in progress[:5]:  # Show last 5
+            for topic, score, completed_at in progress:  # Show last 5
                 score_color = "🟢" if score >= 5 else "🟡"
                 st.markdown(f"{score_color} **{topic}** - Score: {score}/8 - {completed_at}")
             
@@ -334,8 +441,25 @@ def get_age_appropriate_tone(age):
     else:
         return "professional but approachable like talking to an adult professional"
 
+# Generated content is cached per prompt inputs for a day. Exceptions are
+# never cached, so failed calls are retried on the next click.
+@st.cache_data(ttl=86400, show_spinner=False, max_entries=512)
+def _cached_lesson(topic, age, _lesson=None):
+    """Look up a finished lesson, or store one when it is passed in"""
+    # Streamed responses can't be cached directly, so the finished text is
+    # handed in afterwards. Raising on a miss keeps it out of the cache.
+    if _lesson is None:
+        raise LookupError(topic)
+    return _lesson
+
 def generate_lesson(topic, age):
-    """Generate AI lesson content"""
+    """Generate AI lesson content, yielding the text so far as it streams in"""
+    try:
+        yield _cached_lesson(topic, age)
+        return
+    except LookupError:
+        pass
+    
     tone = get_age_appropriate_tone(age)
     
     prompt = f"""
@@ -357,19 +481,39 @@ def generate_lesson(topic, age):
     Keep the explanation comprehensive but digestible, appropriate for age {age}.
     """
     
+    lesson = ""
     try:
-        response = openai.ChatCompletion.create(
+        response = _openai_client().chat.completions.create(
             model="gpt-4o-mini",
             messages=[{"role": "user", "content": prompt}],
-            max_tokens=2000,
-            temperature=0.7
+            max_tokens=1500,
+            temperature=0.7,
+            stream=True
         )
-        return response.choices[0].message.content
+        for chunk in response:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                lesson += delta
+                yield lesson
     except Exception as e:
-        return f"Error generating lesson: {str(e)}"
+        yield f"Error generating lesson: {str(e)}"
+        return
+    
+    # Never store an empty lesson, or every later visit would replay it
+    if lesson:
+        _cached_lesson(topic, age, lesson)
+
+@st.cache_data(ttl=86400, show_spinner=False, max_entries=512)
+def _cached_quiz(topic, age, _questions=None):
+    """Look up a finished quiz, or store one when it is passed in"""
+    # Quizzes are fetched on a worker thread, where st.cache_data can't
+    # write, so the result is stored from the script thread afterwards
+    if _questions is None:
+        raise LookupError(topic)
+    return _questions
 
-def generate_quiz(topic, age):
-    """Generate quiz questions"""
+def _request_quiz(topic, age, client):
+    """Request and parse quiz questions from the model"""
     tone = get_age_appropriate_tone(age)
     
     prompt = f"""
@@ -396,38 +540,68 @@ def generate_quiz(topic, age):
     Make sure all 8 questions are different and cover various aspects of the topic.
     """
     
+    response = client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[{"role": "user", "content": prompt}],
+        max_tokens=1200,
+        temperature=0.4,
+        # JSON mode guarantees a bare JSON object, with no markdown fences
+        response_format={"type": "json_object"}
+    )
+    
+    quiz_data = json.loads(response.choices[0].message.content)
+    questions = quiz_data.get("questions") if isinstance(quiz_data, dict) else None
+    if not questions:
+        # Raise rather than return [] so an empty quiz is never stored
+        raise ValueError("the response contained no quiz questions")
+    return questions
+
+@st.cache_resource
+def _quiz_executor():
+    """Thread pool that prepares quizzes while lessons are being read"""
+    return ThreadPoolExecutor(max_workers=4)
+
+def prefetch_quiz(topic, age):
+    """Start generating quiz questions in the background, unless cached"""
+    try:
+        _cached_quiz(topic, age)
+        return None
+    except LookupError:
+        pass
+    
+    # The worker thread has no script context, so cached resources are
+    # resolved here and only the plain request runs off-thread
     try:
-        response = openai.ChatCompletion.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=2000,
-            temperature=0.7
-        )
-        
-        response_text = response.choices[0].message.content.strip()
-        
-        # Try to extract JSON from response if it's wrapped in markdown
-        if "```json" in response_text:
-            json_start = response_text.find("```json") + 7
-            json_end = response_text.find("```", json_start)
-            response_text = response_text[json_start:json_end].strip()
-        elif "```" in response_text:
-            json_start = response_text.find("```") + 3
-            json_end = response_text.find("```", json_start)
-            response_text = response_text[json_start:json_end].strip()
-        
-        quiz_data = json.loads(response_text)
-        return quiz_data["questions"]
+        client = _openai_client()
+    except Exception:
+        return None  # generate_quiz reports the error when asked
+    return _quiz_executor().submit(_request_quiz, topic, age, client)
+
+def generate_quiz(topic, age, future=None):
+    """Generate quiz questions, using a cached or prefetched result when available"""
+    try:
+        return _cached_quiz(topic, age)
+    except LookupError:
+        pass
+    
+    try:
+        if future is not None:
+            questions = future.result()
+        else:
+            questions = _request_quiz(topic, age, _openai_client())
     except json.JSONDecodeError as e:
         st.error(f"Error parsing quiz JSON: {str(e)}")
-        st.error(f"Raw response: {response_text[:200]}...")
+        st.error(f"Raw response: {e.doc[:200]}...")
         return []
     except Exception as e:
         st.error(f"Error generating quiz: {str(e)}")
         return []
+    
+    return _cached_quiz(topic, age, questions)
 
-def answer_question(question, lesson_topic, age):
-    """Answer user questions about the lesson"""
+@st.cache_data(ttl=86400, show_spinner=False, max_entries=512)
+def _fetch_answer(question, lesson_topic, age):
+    """Request an answer to a lesson question from the model"""
     tone = get_age_appropriate_tone(age)
     
     prompt = f"""
@@ -442,14 +616,18 @@ def answer_question(question, lesson_topic, age):
     Keep your answer focused and educational.
     """
     
+    response = _openai_client().chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[{"role": "user", "content": prompt}],
+        max_tokens=500,
+        temperature=0.7
+    )
+    return response.choices[0].message.content
+
+def answer_question(question, lesson_topic, age):
+    """Answer user questions about the lesson"""
     try:
-        response = openai.ChatCompletion.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=500,
-            temperature=0.7
-        )
-        return response.choices[0].message.content
+        return _fetch_answer(question, lesson_topic, age)
     except Exception as e:
         return f"Sorry, I couldn't process your question right now. Error: {str(e)}"
 
@@ -497,27 +675,39 @@ def start_lesson(topic):
     st.session_state.lesson_topic = topic
     st.session_state.current_lesson = None
     st.session_state.quiz_questions = []
+    st.session_state.quiz_future = None
     st.session_state.quiz_answers = {}
     st.session_state.quiz_submitted = False
     
-    with st.spinner(f"🧠 Generating your personalized lesson on {topic}..."):
-        lesson_content = generate_lesson(topic, st.session_state.user_data['age'])
-        st.session_state.current_lesson = lesson_content
-    
+    # The lesson streams in on the lesson page
     st.rerun()
 
 def lesson_page():
     """Display lesson content and interactions"""
-    if not st.session_state.current_lesson:
+    if not st.session_state.lesson_topic:
         topic_selection_page()
         return
     
-    st.markdown(f'<div class="main-header"><h1>📚 Learning: {st.session_state.lesson_topic}</h1></div>', unsafe_allow_html=True)
+    topic = st.session_state.lesson_topic
+    age = st.session_state.user_data['age']
+    
+    st.markdown(f'<div class="main-header"><h1>📚 Learning: {topic}</h1></div>', unsafe_allow_html=True)
     
     # Lesson content
     st.markdown('<div class="lesson-container">', unsafe_allow_html=True)
     st.markdown("## 📖 Your Lesson")
-    st.markdown(st.session_state.current_lesson)
+    if st.session_state.current_lesson is None:
+        # Generate the quiz alongside the lesson, so "Take Quiz" is instant
+        if st.session_state.quiz_future is None:
+            st.session_state.quiz_future = prefetch_quiz(topic, age)
+        
+        placeholder = st.empty()
+        lesson_content = ""
+        for lesson_content in generate_lesson(topic, age):
+            placeholder.markdown(lesson_content)
+        st.session_state.current_lesson = lesson_content
+    else:
+        st.markdown(st.session_state.current_lesson)
     st.markdown('</div>', unsafe_allow_html=True)
     
     # Question section
@@ -531,17 +721,18 @@ def lesson_page():
         
         if ask_button and user_question:
             with st.spinner("🤖 Thinking..."):
-                answer = answer_question(user_question, st.session_state.lesson_topic, 
-                                       st.session_state.user_data['age'])
+                answer = answer_question(user_question, topic, age)
             st.markdown(f"**🤖 AI Tutor:** {answer}")
     
     # Quiz section
     st.markdown("---")
     if not st.session_state.quiz_questions:
         if st.button("📝 Take Quiz to Continue", use_container_width=True):
+            # A failed prefetch is used once; clicking again fetches afresh
+            future = st.session_state.quiz_future
+            st.session_state.quiz_future = None
             with st.spinner("📝 Generating your quiz..."):
-                st.session_state.quiz_questions = generate_quiz(st.session_state.lesson_topic, 
-                                                               st.session_state.user_data['age'])
+                st.session_state.quiz_questions = generate_quiz(topic, age, future)
             st.rerun()
     else:
         display_quiz()
@@ -567,50 +758,62 @@ def display_quiz():
     st.markdown("**You need 5 correct answers out of 8 to pass!**")
     st.markdown('</div>', unsafe_allow_html=True)
     
+    # Read session state once rather than on every loop iteration
+    questions = st.session_state.quiz_questions
+    answers = st.session_state.quiz_answers
+    user_id = st.session_state.user_data.get('id')
+    
     if not st.session_state.quiz_submitted:
         with st.form("quiz_form"):
-            for i, q in enumerate(st.session_state.quiz_questions):
+            for i, q in enumerate(questions):
                 st.markdown(f'<div class="question-box">', unsafe_allow_html=True)
                 st.markdown(f"**Question {i+1}:** {q['question']}")
                 
-                answer = st.radio(
+                st.radio(
                     f"Select your answer for question {i+1}:",
                     q['options'],
                     key=f"q_{i}",
                     label_visibility="collapsed"
                 )
-                st.session_state.quiz_answers[i] = answer
                 st.markdown('</div>', unsafe_allow_html=True)
             
             submit_quiz = st.form_submit_button("🎯 Submit Quiz", use_container_width=True)
             
             if submit_quiz:
+                # Form values only commit on submit, so collect them here
+                st.session_state.quiz_answers = {
+                    i: st.session_state[f"q_{i}"] for i in range(len(questions))
+                }
                 st.session_state.quiz_submitted = True
                 st.rerun()
     
     else:
         # Show results
         correct_count = 0
-        for i, q in enumerate(st.session_state.quiz_questions):
-            user_answer = st.session_state.quiz_answers.get(i, "")
+        parts = []
+        for i, q in enumerate(questions):
+            user_answer = answers.get(i, "")
             correct_option = q['options'][q['correct']]
             
-            st.markdown(f'<div class="question-box">', unsafe_allow_html=True)
-            st.markdown(f"**Question {i+1}:** {q['question']}")
-            
             if user_answer == correct_option:
-                st.markdown(f"✅ **Your answer:** {user_answer} - **Correct!**")
+                verdict = f"✅ **Your answer:** {user_answer} - **Correct!**"
                 correct_count += 1
             else:
-                st.markdown(f"❌ **Your answer:** {user_answer}")
-                st.markdown(f"✅ **Correct answer:** {correct_option}")
+                verdict = f"❌ **Your answer:** {user_answer}\n\n✅ **Correct answer:** {correct_option}"
             
-            st.markdown(f"**Explanation:** {q['explanation']}")
-            st.markdown('</div>', unsafe_allow_html=True)
+            parts.append(
+                f"**Question {i+1}:** {q['question']}\n\n"
+                f"{verdict}\n\n"
+                f"**Explanation:** {q['explanation']}"
+            )
+        
+        # One element for all results instead of several per question. The
+        # text comes from the model, so it must not be rendered as raw HTML
+        st.markdown("\n\n---\n\n".join(parts))
         
         # Save progress to database
-        if 'id' in st.session_state.user_data:
-            save_user_progress(st.session_state.user_data['id'], st.session_state.lesson_topic, correct_count)
+        if user_id is not None:
+            save_user_progress(user_id, st.session_state.lesson_topic, correct_count)
         
         # Final result
         if correct_count >= 5:
@@ -636,8 +839,8 @@ def display_quiz():
 
 def main():
     """Main application logic"""
-    # Initialize database on first run
-    init_database()
+    # Initialize database once per server process, not on every rerun
+    _init_db_once()
     
     if not st.session_state.logged_in:
         login_page()
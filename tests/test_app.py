@@ -0,0 +1,194 @@
+import importlib.util
+import json
+import sys
+import time
+import types
+from pathlib import Path
+from types import SimpleNamespace
+
+import bcrypt
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+APP_PATH = str(Path(__file__).resolve().parents[1] / "app.py")
+
+QUIZ = {
+    "questions": [
+        {
+            "question": f"Question {i}?",
+            "options": ["A) One", "B) Two", "C) Three", "D) Four"],
+            "correct": 0,
+            "explanation": "Because it is",
+        }
+        for i in range(8)
+    ]
+}
+
+
+class FakeCompletions:
+    """Stands in for client.chat.completions and records each request"""
+
+    def __init__(self):
+        self.calls = []
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        if kwargs.get("stream"):
+            return iter(
+                SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+                for text in ["# Lesson", " content"]
+            )
+        content = json.dumps(QUIZ) if kwargs.get("response_format") else "An answer"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+@pytest.fixture
+def completions(monkeypatch, tmp_path):
+    """Fake OpenAI module, fresh caches and a throwaway database"""
+    fake = FakeCompletions()
+    module = types.ModuleType("openai")
+    module.OpenAI = lambda **kwargs: SimpleNamespace(chat=SimpleNamespace(completions=fake))
+    monkeypatch.setitem(sys.modules, "openai", module)
+    monkeypatch.chdir(tmp_path)
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    yield fake
+    st.cache_data.clear()
+    st.cache_resource.clear()
+
+
+@pytest.fixture
+def app(completions):
+    """The app module loaded outside a script run, with its schema created"""
+    spec = importlib.util.spec_from_file_location("app", APP_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module._init_db_once()
+    return module
+
+
+def insert_user(app, email, password, rounds):
+    password_hash = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=rounds))
+    with app.get_conn() as conn:
+        conn.execute(
+            "INSERT INTO users (email, password_hash, age) VALUES (?, ?, ?)",
+            (email, password_hash, 20),
+        )
+        conn.commit()
+
+
+def stored_hash(app, email):
+    with app.get_conn() as conn:
+        return conn.execute("SELECT password_hash FROM users WHERE email = ?", (email,)).fetchone()[0]
+
+
+def logged_in_app():
+    at = AppTest.from_file(APP_PATH, default_timeout=30)
+    at.session_state.logged_in = True
+    at.session_state.user_data = {"id": 1, "email": "learner@example.com", "age": 18}
+    return at.run()
+
+
+def open_lesson_and_quiz(at, topic):
+    at.button(key=f"lang_{topic}").click().run()
+    at.run()  # lesson streams in on the lesson page
+    time.sleep(0.2)  # let the background quiz request finish
+    take_quiz = next(b for b in at.button if b.label == "📝 Take Quiz to Continue")
+    take_quiz.click().run()
+    assert not at.exception
+    assert len(at.session_state.quiz_questions) == 8
+
+
+def test_revisited_topic_reuses_cached_lesson_and_quiz(completions):
+    at = logged_in_app()
+    open_lesson_and_quiz(at, "Python Basics")
+
+    # Back to topic selection, as "Choose New Topic" does
+    at.session_state.current_lesson = None
+    at.session_state.lesson_topic = ""
+    at.run()
+    open_lesson_and_quiz(at, "Python Basics")
+
+    lesson_requests = [c for c in completions.calls if c.get("stream")]
+    quiz_requests = [c for c in completions.calls if c.get("response_format")]
+    assert len(lesson_requests) == 1
+    assert len(quiz_requests) == 1
+
+
+def test_quiz_results_render_model_text_without_html(completions, monkeypatch):
+    questions = [dict(q) for q in QUIZ["questions"]]
+    questions[0]["question"] = "Which tag makes a list? <style>body{display:none}</style>"
+    questions[0]["options"] = ["A) <ul>", "B) <p>", "C) <a>", "D) <b>"]
+    monkeypatch.setitem(QUIZ, "questions", questions)
+
+    at = logged_in_app()
+    open_lesson_and_quiz(at, "HTML & CSS")
+    next(b for b in at.button if b.label == "🎯 Submit Quiz").click().run()
+    at.run()
+
+    results = next(m for m in at.markdown if "**Question 1:**" in m.value)
+    assert "<style>" in results.value
+    assert "A) <ul>" in results.value
+    assert not results.allow_html
+
+
+def test_login_rehashes_at_current_work_factor(app):
+    insert_user(app, "old@example.com", "secret1", rounds=app.BCRYPT_ROUNDS + 1)
+
+    assert app.authenticate_user("old@example.com", "secret1")["email"] == "old@example.com"
+    assert not app.needs_rehash(stored_hash(app, "old@example.com"))
+    assert app.authenticate_user("old@example.com", "secret1")
+    assert app.authenticate_user("old@example.com", "wrong") is None
+
+
+def test_case_colliding_accounts_can_still_log_in(app):
+    insert_user(app, "Al@example.com", "upper-pass", rounds=app.BCRYPT_ROUNDS)
+    insert_user(app, "al@example.com", "lower-pass", rounds=app.BCRYPT_ROUNDS)
+    app.init_database()  # normalization skips the colliding row
+
+    assert app.authenticate_user("Al@example.com", "upper-pass")["email"] == "Al@example.com"
+    assert app.authenticate_user("AL@example.com", "lower-pass")["email"] == "al@example.com"
+    assert app.authenticate_user("Al@example.com", "wrong") is None
+
+
+def test_login_runs_one_password_check_per_attempt(app, monkeypatch):
+    insert_user(app, "Al@example.com", "upper-pass", rounds=app.BCRYPT_ROUNDS)
+    insert_user(app, "al@example.com", "lower-pass", rounds=app.BCRYPT_ROUNDS)
+    app.init_database()
+
+    checks = []
+    verify = app.verify_password
+    monkeypatch.setattr(app, "verify_password", lambda *args: checks.append(args) or verify(*args))
+
+    for email, password in [
+        ("Al@example.com", "wrong"),
+        ("Al@example.com", "lower-pass"),
+        ("al@example.com", "wrong"),
+        ("nobody@example.com", "wrong"),
+    ]:
+        checks.clear()
+        assert app.authenticate_user(email, password) is None
+        assert len(checks) == 1
+
+
+def test_empty_lesson_stream_is_not_cached(completions, monkeypatch):
+    create = completions.create
+
+    def create_without_lesson_text(**kwargs):
+        if kwargs.get("stream"):
+            completions.calls.append(kwargs)
+            return iter([])
+        return create(**kwargs)
+
+    monkeypatch.setattr(completions, "create", create_without_lesson_text)
+    at = logged_in_app()
+    for _ in range(2):
+        at.button(key="lang_Python Basics").click().run()
+        at.run()
+        at.session_state.current_lesson = None
+        at.session_state.lesson_topic = ""
+        at.run()
+
+    assert not at.exception
+    assert len([c for c in completions.calls if c.get("stream")]) == 2